@@ -0,0 +1,306 @@
+import bisect
+import heapq
+from array import array
+from collections import defaultdict
+from itertools import accumulate
+
+# 每个块包含的文档数，块是解码和跳转的最小单位
+BLOCK_SIZE = 128
+
+# 单字节数值的快速解码：去掉结束标志位 / 全部结束字节
+_STRIP_STOP_BIT = bytes(b & 0x7F for b in range(256))
+_STOP_BYTES = bytes(range(0x80, 0x100))
+
+
+def vbyte_encode(numbers, out=None):
+    # 可变字节编码：每字节低 7 位存数据，最高位为 1 表示该数结束
+    if out is None: out = bytearray()
+    for n in numbers:
+        while n >= 0x80:
+            out.append(n & 0x7F)
+            n >>= 7
+        out.append(n | 0x80)
+    return out
+
+
+def vbyte_decode(data, pos, count):
+    # 常见情况下整段都是单字节数值，直接用 translate 批量解码
+    chunk = data[pos:pos + count]
+    if len(chunk) == count and not chunk.translate(None, _STOP_BYTES):
+        return list(chunk.translate(_STRIP_STOP_BIT)), pos + count
+    values = []
+    n = shift = 0
+    while count:
+        b = data[pos]
+        pos += 1
+        if b & 0x80:
+            values.append(n | ((b & 0x7F) << shift))
+            n = shift = 0
+            count -= 1
+        else:
+            n |= b << shift
+            shift += 7
+    return values, pos
+
+
+class PostingList:
+    # 压缩倒排表：doc_id 差分后与词频一起做可变字节编码，按块记录跳表指针
+    # block_last[i] 为第 i 块最后一个 doc_id，block_offset[i] 为该块在 data 中的起始字节
+    __slots__ = ('data', 'block_last', 'block_offset', 'length')
+
+    def __init__(self, doc_ids=(), tfs=()):
+        out = bytearray()
+        self.block_last = array('I')
+        self.block_offset = array('I')
+        self.length = len(doc_ids)
+        prev = 0
+        for start in range(0, self.length, BLOCK_SIZE):
+            block_ids = doc_ids[start:start + BLOCK_SIZE]
+            self.block_offset.append(len(out))
+            gaps = []
+            for doc_id in block_ids:
+                gaps.append(doc_id - prev)
+                prev = doc_id
+            vbyte_encode(gaps, out)
+            vbyte_encode(tfs[start:start + BLOCK_SIZE], out)
+            self.block_last.append(prev)
+        self.data = bytes(out)
+
+    @classmethod
+    def from_parts(cls, data, block_last, block_offset, length):
+        # 由已编码的数据直接构造（例如从分片文件读出），不重新编码
+        plist = cls.__new__(cls)
+        plist.data = data
+        plist.block_last = block_last
+        plist.block_offset = block_offset
+        plist.length = length
+        return plist
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for i in range(len(self.block_last)):
+            doc_ids, tfs = self.decode_block(i)
+            yield from zip(doc_ids, tfs)
+
+    def block_size(self, i):
+        if i < len(self.block_last) - 1: return BLOCK_SIZE
+        return self.length - i * BLOCK_SIZE
+
+    def decode_block(self, i):
+        count = self.block_size(i)
+        gaps, pos = vbyte_decode(self.data, self.block_offset[i], count)
+        tfs, _ = vbyte_decode(self.data, pos, count)
+        base = self.block_last[i - 1] if i > 0 else 0
+        doc_ids = list(accumulate(gaps, initial=base))[1:]
+        return doc_ids, tfs
+
+    def doc_ids(self):
+        result = []
+        for i in range(len(self.block_last)):
+            result.extend(self.decode_block(i)[0])
+        return result
+
+    def nbytes(self):
+        return len(self.data) + self.block_last.itemsize * len(self.block_last) * 2
+
+
+class PostingCursor:
+    # 顺序读取倒排表；advance 借助块跳表指针跳过不可能命中的整块，只解码需要的块
+    __slots__ = ('plist', 'block', 'doc_ids', 'tfs', 'pos')
+
+    def __init__(self, plist):
+        self.plist = plist
+        self.block = -1
+        self.doc_ids = []
+        self.tfs = []
+        self.pos = 0
+        if len(plist): self._load(0)
+
+    def _load(self, block):
+        self.block = block
+        self.doc_ids, self.tfs = self.plist.decode_block(block)
+        self.pos = 0
+
+    @property
+    def doc(self):
+        if self.pos < len(self.doc_ids): return self.doc_ids[self.pos]
+        return None
+
+    @property
+    def tf(self):
+        return self.tfs[self.pos]
+
+    def next(self):
+        self.pos += 1
+        if self.pos >= len(self.doc_ids) and self.block + 1 < len(self.plist.block_last):
+            self._load(self.block + 1)
+        return self.doc
+
+    def advance(self, target):
+        # 移动到第一个 >= target 的文档，不存在时返回 None
+        doc = self.doc
+        if doc is None or doc >= target: return doc
+        block_last = self.plist.block_last
+        if target > block_last[self.block]:
+            block = bisect.bisect_left(block_last, target, self.block + 1)
+            if block >= len(block_last):
+                self.pos = len(self.doc_ids)
+                return None
+            self._load(block)
+        self.pos = bisect.bisect_left(self.doc_ids, target, self.pos)
+        return self.doc_ids[self.pos]
+
+
+class ListCursor:
+    # 与 PostingCursor 接口一致的普通有序 doc_id 列表游标，用于中间结果
+    __slots__ = ('doc_ids', 'pos')
+
+    def __init__(self, doc_ids):
+        self.doc_ids = doc_ids
+        self.pos = 0
+
+    @property
+    def doc(self):
+        if self.pos < len(self.doc_ids): return self.doc_ids[self.pos]
+        return None
+
+    def next(self):
+        self.pos += 1
+        return self.doc
+
+    def advance(self, target):
+        doc = self.doc
+        if doc is None or doc >= target: return doc
+        self.pos = bisect.bisect_left(self.doc_ids, target, self.pos)
+        return self.doc
+
+
+def open_cursor(docs):
+    if isinstance(docs, PostingList): return PostingCursor(docs)
+    return ListCursor(docs)
+
+
+def build_postings(doc_term_freqs):
+    # 由 {doc_id: {'counts': Counter, ...}} 构建 {词: PostingList}
+    doc_lists = defaultdict(lambda: (array('I'), array('I')))
+    for doc_id in sorted(doc_term_freqs):
+        for word, tc in doc_term_freqs[doc_id]['counts'].items():
+            ids, tfs = doc_lists[word]
+            ids.append(doc_id)
+            tfs.append(tc)
+    return {word: PostingList(ids, tfs) for word, (ids, tfs) in doc_lists.items()}
+
+
+def intersect(plists):
+    # 多路求交：由最短的表驱动，其余表用 advance 跳块
+    # 参数可以是 PostingList，也可以是有序 doc_id 列表
+    if not plists: return []
+    cursors = [open_cursor(p) for p in sorted(plists, key=len)]
+    lead, others = cursors[0], cursors[1:]
+    result = []
+    doc = lead.doc
+    while doc is not None:
+        for c in others:
+            d = c.advance(doc)
+            if d is None: return result
+            if d != doc:
+                doc = lead.advance(d)
+                break
+        else:
+            result.append(doc)
+            doc = lead.next()
+    return result
+
+
+def union(plists):
+    # 多路归并求并集，结果为有序 doc_id 列表
+    lists = [p.doc_ids() if isinstance(p, PostingList) else p for p in plists]
+    result = []
+    for doc in heapq.merge(*lists):
+        if not result or result[-1] != doc: result.append(doc)
+    return result
+
+
+def difference(docs, plist):
+    # docs 中去掉 plist 含有的文档，plist 只按需解码
+    cursor = open_cursor(plist)
+    result = []
+    for i, doc in enumerate(docs):
+        d = cursor.advance(doc)
+        if d is None:
+            result.extend(docs[i:])
+            break
+        if d != doc: result.append(doc)
+    return result
+
+
+# 影响值量化级数：所有 (词, 文档) 得分统一按最大得分缩放到 1 ~ IMPACT_LEVELS
+IMPACT_LEVELS = 255
+
+
+class ImpactIndex:
+    # 按影响值排序的倒排表：每个词的文档按量化后的预计算得分分段，从高到低排列，段内 doc_id 差分编码
+    # score_fn(词, 词频) 给出该词在文档中的得分，同一个词的得分只取决于词频
+    def __init__(self, postings, score_fn):
+        groups = {}
+        max_score = 0.0
+        for word, plist in postings.items():
+            by_tf = {}
+            for doc_id, tc in plist:
+                if tc not in by_tf: by_tf[tc] = array('I')
+                by_tf[tc].append(doc_id)
+            groups[word] = [(score_fn(word, tc), ids) for tc, ids in by_tf.items()]
+            max_score = max(max_score, max(s for s, _ in groups[word]))
+        self.scale = IMPACT_LEVELS / max_score if max_score > 0 else 0.0
+        self.segments = {}
+        while groups:
+            word, scored = groups.popitem()
+            merged = defaultdict(list)
+            for s, ids in scored:
+                merged[max(1, round(s * self.scale))].extend(ids)
+            segments = []
+            for impact in sorted(merged, reverse=True):
+                ids = sorted(merged[impact])
+                gaps = [ids[0]] + [b - a for a, b in zip(ids, ids[1:])]
+                segments.append((impact, len(ids), bytes(vbyte_encode(gaps))))
+            self.segments[word] = segments
+
+    def decode_segment(self, word, i):
+        impact, count, data = self.segments[word][i]
+        return impact, list(accumulate(vbyte_decode(data, 0, count)[0]))
+
+
+def impact_candidates(impacts, multiplicity, k, error, max_candidates=None):
+    # 按影响值从高到低逐段累加（score-at-a-time），前 k 名确定后提前停止
+    # multiplicity 为 {词: 在查询中出现的次数}；error 为量化及 IDF 漂移造成的单篇文档最大误差（量化单位）
+    # 返回所有可能进入前 k 名的 doc_id（升序），由调用方精确计算得分
+    if max_candidates is None: max_candidates = 4 * k
+    order = []
+    next_impact = {}
+    for word, m in multiplicity.items():
+        segments = impacts.segments.get(word)
+        if not segments: continue
+        next_impact[word] = segments[0][0] * m
+        order.extend((segments[i][0] * m, word, i) for i in range(len(segments)))
+    order.sort(key=lambda x: -x[0])
+
+    acc = defaultdict(int)
+    threshold = 0
+    for weighted, word, i in order:
+        for doc_id in impacts.decode_segment(word, i)[1]:
+            acc[doc_id] += weighted
+        segments = impacts.segments[word]
+        next_impact[word] = segments[i + 1][0] * multiplicity[word] if i + 1 < len(segments) else 0
+        remaining = sum(next_impact.values())
+        if len(acc) < k: continue
+        kth = heapq.nlargest(k, acc.values())[-1]
+        # 未出现的文档最多再得 remaining 分，已出现文档的上界为 acc + remaining
+        if remaining + error >= kth - error: continue
+        threshold = kth - 2 * error - remaining
+        candidates = [doc_id for doc_id, s in acc.items() if s >= threshold]
+        if len(candidates) <= max_candidates: return sorted(candidates)
+
+    if len(acc) >= k: threshold = heapq.nlargest(k, acc.values())[-1] - 2 * error
+    return sorted(doc_id for doc_id, s in acc.items() if s >= threshold)
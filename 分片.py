@@ -0,0 +1,160 @@
+import os
+import mmap
+import heapq
+import pickle
+import struct
+import bisect
+import threading
+import multiprocessing
+from array import array
+
+from 倒排索引 import PostingList
+
+# 分片评分：把一个库的倒排表按 doc_id 区间切成若干分片文件，由进程池并行评分。
+# 各进程以只读 mmap 打开分片文件，同一分片的数据在操作系统页缓存中只有一份；
+# IDF 由主进程按全局文档频率算好随查询发给各分片，各分片返回本分片的前 k 名，主进程合并。
+#
+# 分片文件格式：MAGIC | 词典长度(8 字节) | 词典 pickle | 各词倒排数据拼接
+# 词典为 {'build_id': ..., 'terms': {词: (偏移, 字节数, 文档数, block_last 字节, block_offset 字节)}}
+
+MAGIC = b'MYSEARCH-SHARD\n'
+_LENGTH = struct.Struct('<Q')
+
+
+def shard_paths(prefix, build_id, num_shards):
+    # 文件名带上 build_id：重建后写入新文件，不会覆盖仍被其他进程映射的旧文件；
+    # 旧文件由持有它的引擎在关闭时删除（见 remove_shards）
+    return [f"{prefix}.{build_id}.shard{i}" for i in range(num_shards)]
+
+
+def write_shards(postings, doc_ids, prefix, build_id, num_shards):
+    # doc_ids 为全部文档的 doc_id，按升序均分为 num_shards 个区间
+    paths = shard_paths(prefix, build_id, num_shards)
+    if all(os.path.exists(p) for p in paths): return paths
+    doc_ids = sorted(doc_ids)
+    # bounds[i] 为第 i 个分片的第一个 doc_id
+    bounds = [doc_ids[len(doc_ids) * i // num_shards] for i in range(1, num_shards)] if doc_ids else []
+    blobs = [bytearray() for _ in range(num_shards)]
+    terms = [{} for _ in range(num_shards)]
+    for word, plist in postings.items():
+        parts = [(array('I'), array('I')) for _ in range(num_shards)]
+        for doc_id, tc in plist:
+            ids, tfs = parts[bisect.bisect_right(bounds, doc_id)]
+            ids.append(doc_id)
+            tfs.append(tc)
+        for i, (ids, tfs) in enumerate(parts):
+            if not ids: continue
+            part = PostingList(ids, tfs)
+            terms[i][word] = (len(blobs[i]), len(part.data), part.length,
+                              part.block_last.tobytes(), part.block_offset.tobytes())
+            blobs[i] += part.data
+
+    for path, blob, shard_terms in zip(paths, blobs, terms):
+        header = pickle.dumps({'build_id': build_id, 'terms': shard_terms}, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(_LENGTH.pack(len(header)))
+            f.write(header)
+            f.write(blob)
+        os.replace(tmp_path, path)
+    return paths
+
+
+def remove_shards(paths):
+    # 删除分片文件；Windows 上仍被其他进程映射的文件删除失败，留给那个进程关闭时删除
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class _Shard:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:len(MAGIC)] != MAGIC: raise ValueError(f"不是分片文件: {path}")
+        header_size = _LENGTH.unpack(self.mm[len(MAGIC):len(MAGIC) + _LENGTH.size])[0]
+        header_start = len(MAGIC) + _LENGTH.size
+        self.terms = pickle.loads(self.mm[header_start:header_start + header_size])['terms']
+        self.base = header_start + header_size
+
+    def postings(self, word):
+        entry = self.terms.get(word)
+        if entry is None: return None
+        offset, size, length, block_last, block_offset = entry
+        last, offsets = array('I'), array('I')
+        last.frombytes(block_last)
+        offsets.frombytes(block_offset)
+        start = self.base + offset
+        return PostingList.from_parts(self.mm[start:start + size], last, offsets, length)
+
+
+# 工作进程内已打开的分片
+_open_shards = {}
+
+
+def _init_worker(paths):
+    # 进程池启动时映射全部分片：之后即使文件被删除（POSIX）仍可读取，不依赖首次查询时文件还在
+    for path in paths:
+        _open_shards[path] = _Shard(path)
+
+
+def _tf(term_count):
+    # 与 RankedSearchEngine._tf 相同的 TF 饱和度处理
+    return (term_count * 2.0) / (term_count + 1.5)
+
+
+def score_shard(path, term_weights, top_k):
+    # 在工作进程中执行：term_weights 为 [(词, IDF x 权重)]，返回本分片前 k 名 [(doc_id, 得分)]
+    shard = _open_shards[path]
+    scores = {}
+    for word, weight in term_weights:
+        plist = shard.postings(word)
+        if plist is None: continue
+        for doc_id, tc in plist:
+            scores[doc_id] = scores.get(doc_id, 0.0) + _tf(tc) * weight
+    return heapq.nlargest(top_k, scores.items(), key=lambda x: (x[1], -x[0]))
+
+
+class ShardedSearcher:
+    def __init__(self, paths, processes=None):
+        self.paths = paths
+        self.pool = multiprocessing.Pool(processes=processes or min(len(paths), os.cpu_count() or 1),
+                                         initializer=_init_worker, initargs=(paths,))
+        # 进行中的查询数；close 之后不再接受新查询，最后一个查询结束时才关闭进程池
+        self._lock = threading.Lock()
+        self._active = 0
+        self._closing = False
+        self._remove_files = False
+
+    def search(self, term_weights, top_k):
+        # 各分片并行评分，合并后返回 [(doc_id, 得分)]；已关闭时返回 None，由调用方改为单进程评分
+        with self._lock:
+            if self._closing: return None
+            self._active += 1
+        try:
+            parts = self.pool.starmap(score_shard, [(path, term_weights, top_k) for path in self.paths])
+        finally:
+            with self._lock:
+                self._active -= 1
+                last = self._closing and self._active == 0
+            if last: self._shutdown()
+        merged = [item for part in parts for item in part]
+        return heapq.nlargest(top_k, merged, key=lambda x: (x[1], -x[0]))
+
+    def close(self, remove_files=False):
+        # 不终止进行中的查询：没有查询时立即关闭，否则由最后一个查询结束时关闭；
+        # remove_files 为 True 时进程退出后删除分片文件（Windows 上映射中的文件无法删除）
+        with self._lock:
+            if self._closing: return
+            self._closing = True
+            self._remove_files = remove_files
+            idle = self._active == 0
+        if idle: self._shutdown()
+
+    def _shutdown(self):
+        self.pool.close()
+        self.pool.join()
+        if self._remove_files: remove_shards(self.paths)
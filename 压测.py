@@ -0,0 +1,78 @@
+import time
+import json
+import random
+import asyncio
+import argparse
+from urllib.parse import urlencode
+
+# 搜索服务压测：多个长连接并发发送 /search 请求，统计吞吐量和延迟分位数
+# 用法：先启动 python 服务.py，再运行 python 压测.py --folder 库路径 -c 16 -n 2000
+
+DEFAULT_QUERIES = ["机器学习", "算法", "数据", "python", "报告 ext:pdf", "搜索 AND 引擎", "深度学习 NOT 框架"]
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line: raise ConnectionError("连接已关闭")
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''): break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length': length = int(value.strip())
+    body = await reader.readexactly(length) if length else b''
+    return status, body
+
+
+async def worker(args, queries, state, latencies, errors):
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    try:
+        while state['sent'] < args.requests:
+            state['sent'] += 1
+            params = {'q': random.choice(queries), 'top_k': args.top_k}
+            if args.folder: params['folder'] = args.folder
+            request = (f"GET /search?{urlencode(params)} HTTP/1.1\r\n"
+                       f"Host: {args.host}\r\nConnection: keep-alive\r\n\r\n")
+            start = time.perf_counter()
+            writer.write(request.encode('latin-1'))
+            await writer.drain()
+            status, body = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(json.loads(body.decode('utf-8')).get('error', status))
+    finally:
+        writer.close()
+
+
+def percentile(sorted_values, p):
+    if not sorted_values: return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+async def main(args):
+    queries = args.queries or DEFAULT_QUERIES
+    state = {'sent': 0}
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(args, queries, state, latencies, errors) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"请求数 {len(latencies)}，并发 {args.concurrency}，耗时 {elapsed:.2f}s，错误 {len(errors)}")
+    print(f"吞吐量: {len(latencies) / elapsed:.1f} 请求/秒")
+    print("延迟(ms): " + "  ".join(f"{name} {percentile(latencies, p) * 1000:.1f}"
+                                   for name, p in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0))))
+    if errors: print(f"错误示例: {errors[0]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="搜索服务压测")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--folder', default='', help="要查询的库文件夹，默认由服务决定")
+    parser.add_argument('-c', '--concurrency', type=int, default=16)
+    parser.add_argument('-n', '--requests', type=int, default=2000)
+    parser.add_argument('--top-k', type=int, default=20)
+    parser.add_argument('queries', nargs='*', help="查询词，默认使用内置的几个查询")
+    asyncio.run(main(parser.parse_args()))
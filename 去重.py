@@ -0,0 +1,84 @@
+import hashlib
+from array import array
+
+# 近似重复检测：按字符 shingle 计算 MinHash 签名，用 LSH 分桶只比较同桶文档
+# 签名采用单次哈希分箱（one permutation hashing）：哈希值按低位分到 NUM_PERM 个箱，
+# 每箱取最小值，一次遍历即可得到签名；扫描时直接更新每箱最小值，不保存 shingle 集合，
+# 额外内存与文件大小无关
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+# 签名估计的 Jaccard 相似度达到该值即视为重复；8 x 8 分桶时约 0.77 以上的文档对会落入同一个桶
+NEAR_DUP_THRESHOLD = 0.8
+# shingle 太少时很多箱为空、估计不准，只做精确去重
+MIN_SHINGLES = 400
+
+_HASH_MASK = (1 << 64) - 1
+# 空箱标记；签名存为 array('Q')，取 64 位最大值
+_EMPTY = _HASH_MASK
+# 每次计算哈希的 shingle 数
+_CHUNK = 1 << 16
+
+
+def normalize(text):
+    # 去掉所有空白，排版不同（换行、缩进）的副本视为相同
+    return ''.join(text.split())
+
+
+def minhash(s):
+    # s 为 normalize 之后的文本，返回签名
+    # 使用内置 hash，签名只在同一次建索引过程中比较，不写入索引文件
+    sig = [_EMPTY] * NUM_PERM
+    n = len(s) - SHINGLE_SIZE + 1
+    for start in range(0, n, _CHUNK):
+        for h in [hash(s[i:i + SHINGLE_SIZE]) for i in range(start, min(start + _CHUNK, n))]:
+            h &= _HASH_MASK
+            b = h % NUM_PERM
+            if h < sig[b]: sig[b] = h
+    return array('Q', sig)
+
+
+def similarity(sig_a, sig_b):
+    # 只统计至少一方非空的箱
+    used = matched = 0
+    for x, y in zip(sig_a, sig_b):
+        if x == _EMPTY and y == _EMPTY: continue
+        used += 1
+        if x == y: matched += 1
+    return matched / used if used else 0.0
+
+
+class Deduplicator:
+    # 建索引期间使用：精确重复按内容哈希查表，近似重复按 MinHash/LSH 查找
+    def __init__(self):
+        self.exact = {}
+        self.signatures = {}
+        self.buckets = {}
+
+    def check(self, text):
+        # 返回 (重复的 doc_id 或 None, 指纹)；指纹在文档确认加入后传给 add
+        s = normalize(text)
+        digest = hashlib.sha1(s.encode('utf-8')).hexdigest()
+        if digest in self.exact: return self.exact[digest], (digest, None)
+        if len(s) - SHINGLE_SIZE + 1 < MIN_SHINGLES: return None, (digest, None)
+        sig = minhash(s)
+        seen = set()
+        for key in self._band_keys(sig):
+            for other in self.buckets.get(key, ()):
+                if other in seen: continue
+                seen.add(other)
+                if similarity(sig, self.signatures[other]) >= NEAR_DUP_THRESHOLD: return other, (digest, sig)
+        return None, (digest, sig)
+
+    def add(self, doc_id, fingerprint):
+        digest, sig = fingerprint
+        self.exact[digest] = doc_id
+        if sig is None: return
+        self.signatures[doc_id] = sig
+        for key in self._band_keys(sig):
+            self.buckets.setdefault(key, []).append(doc_id)
+
+    def _band_keys(self, sig):
+        # 桶键只保存哈希值；不同段内容碰撞到同一个桶只会多比较一次签名
+        return [hash((band, sig[band * ROWS:(band + 1) * ROWS].tobytes())) for band in range(BANDS)]
@@ -2,59 +2,16 @@ import customtkinter as ctk
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import os
-import sys
-import jieba
-import math
-import warnings
-import pdfplumber
 # import threading
-import pickle
 import json
-import hashlib
-from collections import defaultdict, Counter
+import multiprocessing
 from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 
-try:
-    from docx import Document
-
-    HAS_DOCX = True
-except ImportError:
-    HAS_DOCX = False
-
-try:
-    from pptx import Presentation
-
-    HAS_PPTX = True
-except ImportError:
-    HAS_PPTX = False
-
-try:
-    import pandas as pd
-
-    HAS_PANDAS = True
-except ImportError:
-    HAS_PANDAS = False
-
-try:
-    from bs4 import BeautifulSoup
-
-    HAS_BS4 = True
-except ImportError:
-    HAS_BS4 = False
-
-def get_resource_path(relative_path):
-    try:
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
-
-    return os.path.join(base_path, relative_path)
+from 搜索引擎 import RankedSearchEngine, build_index_from_folder, get_index_path
+from 索引存储 import IndexChangedError, read_header
 
 # 基础配置
-warnings.filterwarnings("ignore", message=".*pkg_resources.*")
-jieba.setLogLevel(jieba.logging.ERROR)
-
 ctk.set_appearance_mode("Light")
 ctk.set_default_color_theme("blue")
 
@@ -77,148 +34,6 @@ COLORS = {
     "header_bg": "#FFFFFF", "header_text": "#1387C0",
 }
 
-# 搜索引擎
-class RankedSearchEngine:
-    def __init__(self, stop_words_file='stopwords.txt'):
-        self.documents = {}
-        self.doc_paths = {}
-        self.doc_titles = {}
-        self.doc_freq = defaultdict(int)
-        self.doc_term_freqs = {}
-        self.total_docs = 0
-        real_path = get_resource_path(stop_words_file)
-        self.stop_words = self._load_stop_words(real_path)
-        self.indexed_folder = ""
-
-    def _load_stop_words(self, file_path):
-        loaded = set()
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    loaded = {line.strip() for line in f if line.strip()}
-            except:
-                pass
-        return loaded
-
-    def save_index_to_disk(self, file_path):
-        try:
-            with open(file_path, 'wb') as f:
-                pickle.dump(self.__dict__, f)
-        except Exception as e:
-            print(f"保存索引失败: {e}")
-
-    def load_index_from_disk(self, file_path):
-        try:
-            if not os.path.exists(file_path): return False
-            with open(file_path, 'rb') as f:
-                tmp_dict = pickle.load(f)
-                self.__dict__.update(tmp_dict)
-            return True
-        except:
-            return False
-
-    def add_document(self, doc_id, text, file_path, title):
-        self.documents[doc_id] = text
-        self.doc_paths[doc_id] = file_path
-        self.doc_titles[doc_id] = title
-        self.total_docs += 1
-
-        words = jieba.lcut(text)
-        # 过滤
-        clean_words = [w for w in words if w not in self.stop_words and len(w.strip()) > 0]
-        # 记录词频信息
-        self.doc_term_freqs[doc_id] = {'counts': Counter(clean_words), 'length': len(clean_words)}
-        # 更新文档频率 (DF)
-        for word in set(clean_words):
-            self.doc_freq[word] += 1
-
-    def _calculate_score(self, query_words, doc_id):
-        score = 0.0
-        doc_data = self.doc_term_freqs[doc_id]
-        if doc_data['length'] == 0: return 0.0
-
-        for word in query_words:
-            term_count = doc_data['counts'].get(word, 0)
-            if term_count == 0: continue
-
-            # TF 饱和度处理
-            tf = (term_count * 2.0) / (term_count + 1.5)
-            # IDF 平滑处理
-            idf = math.log10(self.total_docs / (self.doc_freq.get(word, 0) + 1)) + 1.0
-            score += tf * idf
-        return score
-
-    def search(self, query, top_k=20):
-        # 预处理
-        raw_words = jieba.lcut(query)
-        query_words = [w for w in raw_words if w not in self.stop_words and len(w.strip()) > 0]
-        if not query_words and len(query.strip()) > 0:
-            query_words = [query.strip()]
-        if not query_words: return []
-
-        # 评分
-        temp_results = []
-        max_raw_score = 0
-        for doc_id in self.documents:
-            s = self._calculate_score(query_words, doc_id)
-            if s > 0:
-                temp_results.append((doc_id, s))
-                if s > max_raw_score: max_raw_score = s
-
-        # 显式降序排序
-        temp_results.sort(key=lambda x: x[1], reverse=True)
-
-        results = []
-        for doc_id, s in temp_results[:top_k]:
-            display_score = int((s / max_raw_score) * 99) if max_raw_score > 0 else 0
-            results.append({
-                'score': display_score,
-                'title': self.doc_titles[doc_id],
-                'path': self.doc_paths[doc_id],
-                'content': self.documents[doc_id]
-            })
-        return results
-
-    def _extract_content(self, file_path):
-        ext = os.path.splitext(file_path)[1].lower()
-        content = ""
-        try:
-            if ext == '.pdf':
-                with pdfplumber.open(file_path) as pdf:
-                    for page in pdf.pages:
-                        txt = page.extract_text()
-                        if txt: content += txt + "\n"
-            elif ext == '.docx' and HAS_DOCX:
-                doc = Document(file_path)
-                content = "\n".join([p.text for p in doc.paragraphs])
-            elif ext == '.pptx' and HAS_PPTX:
-                prs = Presentation(file_path)
-                for slide in prs.slides:
-                    for shape in slide.shapes:
-                        if hasattr(shape, "text"): content += shape.text + "\n"
-            elif ext in ['.xlsx', '.xls', '.csv'] and HAS_PANDAS:
-                if ext == '.csv':
-                    df = pd.read_csv(file_path, on_bad_lines='skip')
-                else:
-                    df = pd.read_excel(file_path)
-                content = df.to_string()
-            elif ext in ['.html', '.xml'] and HAS_BS4:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    soup = BeautifulSoup(f, 'html.parser')
-                    content = soup.get_text()
-            elif ext in ['.txt', '.md', '.py', '.json', '.log', '.xml']:
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                except UnicodeDecodeError:
-                    try:
-                        with open(file_path, 'r', encoding='gbk') as f:
-                            content = f.read()
-                    except:
-                        pass
-        except Exception as e:
-            print(f"❌ 解析失败: {os.path.basename(file_path)} -> {e}")
-        return content
 
 # 界面逻辑
 class VibrantSearchApp(ctk.CTk):
@@ -235,6 +50,8 @@ class VibrantSearchApp(ctk.CTk):
         self.search_history = []
 
         self.executor = ThreadPoolExecutor(max_workers=1)
+        # 每次切换库或重建索引时递增，过期的后台加载结果直接丢弃
+        self.load_token = 0
         self.indexes_dir = "indexes"
         if not os.path.exists(self.indexes_dir): os.makedirs(self.indexes_dir)
 
@@ -415,8 +232,7 @@ class VibrantSearchApp(ctk.CTk):
             pass
 
     def get_index_path(self, folder_path):
-        hash_name = hashlib.md5(folder_path.encode('utf-8')).hexdigest()
-        return os.path.join(self.indexes_dir, f"index_{hash_name}.pkl")
+        return get_index_path(folder_path, self.indexes_dir)
 
     def browse_new_folder(self):
         path = filedialog.askdirectory()
@@ -434,18 +250,48 @@ class VibrantSearchApp(ctk.CTk):
         self.folder_var.set(os.path.basename(selected_folder))
         self.status_label.configure(text=f"📂 选中库:\n{selected_folder}")
         index_file = self.get_index_path(selected_folder)
+        self.load_token += 1
         if os.path.exists(index_file):
-            success = self.engine.load_index_from_disk(index_file)
-            if success:
-                self.status_label.configure(text=f"☑ 已加载索引\n包含 {self.engine.total_docs} 篇文档")
-                self.btn_search.configure(state="normal")
+            # 头文件很小，先显示文档数和建立时间，索引本体在后台加载
+            header = read_header(index_file)
+            if header:
+                status = f"⏳ 正在加载索引\n包含 {header['total_docs']} 篇文档\n建立于 {header['built_at']}"
             else:
-                self.status_label.configure(text="⚠️ 索引损坏，请重建")
+                status = "⏳ 正在加载索引..."
+            self._set_loading_state(True, status)
+            self.executor.submit(self.run_loading_task, index_file, self.load_token)
         else:
-            self.status_label.configure(text="⚠️ 此库无索引\n请点击下方按钮重建")
-            self.engine = RankedSearchEngine()
+            self._set_loading_state(False, "⚠️ 此库无索引\n请点击下方按钮重建")
+            self.set_engine(RankedSearchEngine())
         self.btn_index.configure(state="normal")
 
+    def run_loading_task(self, index_file, token):
+        if token != self.load_token: return
+        engine = RankedSearchEngine()
+        progress = lambda fraction: self.after(0, lambda: self.update_loading_progress(token, fraction))
+        success = engine.load_index_from_disk(index_file, progress)
+        if success and token == self.load_token: engine.auto_shard(index_file)
+        self.after(0, lambda: self.finish_loading(engine, success, token))
+
+    def update_loading_progress(self, token, fraction):
+        if token == self.load_token: self.progress.set(fraction)
+
+    def finish_loading(self, engine, success, token):
+        if token != self.load_token:
+            engine.close_shards()
+            return
+        if success:
+            self.set_engine(engine)
+            self._set_loading_state(False, f"☑ 已加载索引\n包含 {engine.total_docs} 篇文档")
+        else:
+            self._set_loading_state(False, "⚠️ 索引损坏，请重建")
+            self.btn_search.configure(state="disabled")
+
+    def set_engine(self, engine):
+        # 替换当前引擎，并结束旧引擎的分片评分进程
+        old, self.engine = self.engine, engine
+        if old is not engine: old.close_shards()
+
     def clear_search_history(self):
         if not self.search_history: return
         if messagebox.askyesno("确认", "确定要清空所有搜索记录吗？"):
@@ -463,31 +309,20 @@ class VibrantSearchApp(ctk.CTk):
         self.save_app_data()
 
     def start_indexing(self):
+        self.load_token += 1
         self._set_ui_busy_state(True, "正在扫描并建立索引...\n请留意控制台输出")
         self.executor.submit(self.run_indexing_task)
 
     def run_indexing_task(self):
-        count = 0
         try:
-            print(f"--- 开始扫描文件夹: {self.current_folder} ---")
             # 重新初始化引擎，但传入当前的停用词表路径（如果有的话）
-            self.engine = RankedSearchEngine()
-            self.engine.indexed_folder = self.current_folder
-
-            for root, dirs, files in os.walk(self.current_folder):
-                for file in files:
-                    full_path = os.path.join(root, file)
-                    print(f"正在读取: {file}")
-                    content = self.engine._extract_content(full_path)
-
-                    if content.strip():
-                        # 这里调用 add_document，现在它一定存在了
-                        self.engine.add_document(count, content, full_path, file)
-                        count += 1
-
-            print(f"--- 扫描结束，共有效索引 {count} 个文件 ---")
+            engine = RankedSearchEngine()
+            count, _ = build_index_from_folder(self.current_folder, engine)
             save_path = self.get_index_path(self.current_folder)
-            self.engine.save_index_to_disk(save_path)
+            engine.save_index_to_disk(save_path)
+            engine.auto_shard(save_path)
+            # 新索引保存后再替换，旧引擎关闭时才能判断出它的分片文件已过期并删除
+            self.set_engine(engine)
             self.after(0, lambda: self.finish_indexing(count))
 
         except Exception as e:
@@ -516,10 +351,18 @@ class VibrantSearchApp(ctk.CTk):
             results = self.engine.search(query)
             print(f"搜索完成，找到 {len(results)} 个结果")
             self.after(0, lambda: self.update_results_ui(results, query))
+        except IndexChangedError:
+            # 其他程序重建了当前库的索引，重新加载后再搜索
+            print("索引文件已被更新，重新加载")
+            self.after(0, self.reload_after_index_change)
         except Exception as e:
             print(f"❌ 搜索过程出错: {e}")
             self.after(0, lambda: self._set_ui_busy_state(False, "搜索出错"))
 
+    def reload_after_index_change(self):
+        self.btn_search.configure(state="normal", text="🔍 开始搜索")
+        self.on_folder_change(self.current_folder)
+
     def update_results_ui(self, results, query):
         self.btn_search.configure(state="normal", text="🔍 开始搜索")
         if not results:
@@ -553,6 +396,12 @@ class VibrantSearchApp(ctk.CTk):
                                                                                                             padx=15,
                                                                                                             pady=(
                                                                                                             0, 10))
+        if res.get('duplicates'):
+            # 重复文件折叠显示在同一张卡片中
+            dup_text = f"另有 {len(res['duplicates'])} 个相同或相似文件:\n" + "\n".join(res['duplicates'][:3])
+            if len(res['duplicates']) > 3: dup_text += "\n..."
+            ctk.CTkLabel(card, text=dup_text, font=ctk.CTkFont(size=11), text_color="gray", anchor="w",
+                         justify="left").pack(fill="x", padx=15, pady=(0, 10))
 
         content = res['content'].replace('\n', ' ')
         idx = content.find(query)
@@ -579,6 +428,19 @@ class VibrantSearchApp(ctk.CTk):
         except Exception as e:
             messagebox.showerror("Error", f"Cannot open file:\n{e}")
 
+    def _set_loading_state(self, is_loading, status_text):
+        # 加载期间只禁用搜索，仍可切换到其他库；进度条显示实际读取进度
+        self.btn_search.configure(state="disabled" if is_loading else "normal")
+        self.status_label.configure(text=status_text)
+        self.progress.stop()
+        if is_loading:
+            self.progress.configure(mode="determinate")
+            self.progress.set(0)
+            self.progress.pack(padx=25, pady=10, fill="x")
+        else:
+            self.progress.configure(mode="indeterminate")
+            self.progress.pack_forget()
+
     def _set_ui_busy_state(self, is_busy, status_text):
         state = "disabled" if is_busy else "normal"
         self.btn_index.configure(state=state)
@@ -586,6 +448,7 @@ class VibrantSearchApp(ctk.CTk):
         self.btn_add_folder.configure(state=state)
         self.status_label.configure(text=status_text)
         if is_busy:
+            self.progress.configure(mode="indeterminate")
             self.progress.pack(padx=25, pady=10, fill="x")
             self.progress.start()
         else:
@@ -594,11 +457,14 @@ class VibrantSearchApp(ctk.CTk):
 
 
 if __name__ == "__main__":
+    # 打包为 exe 后分片评分的子进程需要
+    multiprocessing.freeze_support()
     app = VibrantSearchApp()
 
 
     def on_closing():
         app.executor.shutdown(wait=False)
+        app.engine.close_shards()
         app.destroy()
 
 
@@ -0,0 +1,147 @@
+import sys
+import math
+import time
+import random
+from array import array
+from collections import Counter
+
+from 倒排索引 import PostingCursor, ImpactIndex, build_postings, impact_candidates, intersect
+from 索引存储 import load_index
+
+# 用法：
+#   python 基准测试.py                  使用随机生成的语料（词频服从 Zipf 分布）
+#   python 基准测试.py indexes/xxx.pkl  使用 可视化.py / 服务.py 生成的索引文件
+
+
+def synthetic_corpus(num_docs=20000, vocab_size=30000, doc_len=200, seed=42):
+    rng = random.Random(seed)
+    vocab = [f"w{i}" for i in range(vocab_size)]
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, vocab_size + 1):
+        total += 1.0 / rank
+        cum_weights.append(total)
+    doc_term_freqs = {}
+    for doc_id in range(num_docs):
+        words = rng.choices(vocab, cum_weights=cum_weights, k=doc_len)
+        doc_term_freqs[doc_id] = {'counts': Counter(words), 'length': doc_len}
+    return doc_term_freqs
+
+
+def load_corpus(index_file):
+    # 词频表在索引文件中按需读取，这里一次性全部读入
+    return dict(load_index(index_file)[2])
+
+
+def build_raw_postings(doc_term_freqs):
+    # 对照组：未压缩的 doc_id / 词频数组
+    raw = {}
+    for doc_id in sorted(doc_term_freqs):
+        for word, tc in doc_term_freqs[doc_id]['counts'].items():
+            if word not in raw: raw[word] = (array('I'), array('I'))
+            raw[word][0].append(doc_id)
+            raw[word][1].append(tc)
+    return raw
+
+
+def raw_intersect(lists):
+    # 对照组：逐个元素归并求交
+    result = list(lists[0])
+    for ids in lists[1:]:
+        merged = []
+        i = j = 0
+        while i < len(result) and j < len(ids):
+            if result[i] == ids[j]:
+                merged.append(result[i])
+                i += 1
+                j += 1
+            elif result[i] < ids[j]:
+                i += 1
+            else:
+                j += 1
+        result = merged
+    return result
+
+
+def term_score(tc, idf):
+    # 与 搜索引擎.py 相同的 TF 饱和度 x IDF
+    return (tc * 2.0) / (tc + 1.5) * idf
+
+
+def top_k_by_term(postings, idfs, words, k):
+    # 对照组：逐词遍历完整倒排表累加得分
+    scores = Counter()
+    for word in words:
+        for doc_id, tc in postings[word]:
+            scores[doc_id] += term_score(tc, idfs[word])
+    return sorted(scores.items(), key=lambda x: (-x[1], x[0]))[:k]
+
+
+def top_k_by_impact(impacts, postings, idfs, words, k):
+    # 按影响值逐段累加并提前停止，再对候选文档精确计算得分
+    multiplicity = Counter(words)
+    candidates = impact_candidates(impacts, multiplicity, k, sum(multiplicity.values()))
+    cursors = {w: PostingCursor(postings[w]) for w in multiplicity}
+    results = []
+    for doc_id in candidates:
+        s = 0.0
+        for word in words:
+            if cursors[word].advance(doc_id) == doc_id: s += term_score(cursors[word].tf, idfs[word])
+        results.append((doc_id, s))
+    return sorted(results, key=lambda x: (-x[1], x[0]))[:k]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    if len(sys.argv) > 1:
+        print(f"加载索引: {sys.argv[1]}")
+        doc_term_freqs = load_corpus(sys.argv[1])
+    else:
+        print("生成随机语料...")
+        doc_term_freqs = synthetic_corpus()
+
+    raw, raw_build = timed(build_raw_postings, doc_term_freqs)
+    postings, build_time = timed(build_postings, doc_term_freqs)
+    total = sum(len(ids) for ids, _ in raw.values())
+    raw_bytes = sum(ids.itemsize * len(ids) + tfs.itemsize * len(tfs) for ids, tfs in raw.values())
+    packed_bytes = sum(p.nbytes() for p in postings.values())
+
+    print(f"文档数 {len(doc_term_freqs)}，词项数 {len(raw)}，倒排项 {total}")
+    print(f"未压缩: {raw_bytes / 1024 / 1024:.2f} MB  构建 {raw_build:.2f}s")
+    print(f"压缩后: {packed_bytes / 1024 / 1024:.2f} MB  构建 {build_time:.2f}s  "
+          f"压缩率 {packed_bytes / raw_bytes:.1%}")
+
+    # 全量解码吞吐：遍历全部倒排项
+    _, raw_scan = timed(lambda: sum(1 for ids, tfs in raw.values() for _ in zip(ids, tfs)))
+    _, decode = timed(lambda: sum(1 for p in postings.values() for _ in p))
+    print(f"顺序读取: 未压缩 {total / raw_scan / 1e6:.2f} M项/s，压缩 {total / decode / 1e6:.2f} M项/s")
+
+    # 合取查询：高频词与中低频词求交，压缩表可以整块跳过
+    by_df = sorted(raw, key=lambda w: len(raw[w][0]), reverse=True)
+    rng = random.Random(7)
+    pairs = [(rng.choice(by_df[:20]), rng.choice(by_df[1000:10000] or by_df)) for _ in range(200)]
+    raw_results, raw_and = timed(lambda: [raw_intersect([raw[a][0], raw[b][0]]) for a, b in pairs])
+    results, packed_and = timed(lambda: [intersect([postings[a], postings[b]]) for a, b in pairs])
+    assert raw_results == results
+    print(f"合取查询 {len(pairs)} 次: 未压缩逐项归并 {raw_and * 1000:.1f} ms，"
+          f"压缩跳块求交 {packed_and * 1000:.1f} ms")
+
+    # 前 20 名的 OR 查询：逐词累加 vs 按影响值排序并提前停止
+    n = len(doc_term_freqs)
+    idfs = {w: math.log10(n / (len(raw[w][0]) + 1)) + 1.0 for w in raw}
+    impacts, impact_build = timed(ImpactIndex, postings, lambda w, tc: term_score(tc, idfs[w]))
+    queries = [[rng.choice(by_df[:200]) for _ in range(rng.randint(1, 3))] for _ in range(100)]
+    expected, taat = timed(lambda: [top_k_by_term(postings, idfs, q, 20) for q in queries])
+    results, saat = timed(lambda: [top_k_by_impact(impacts, postings, idfs, q, 20) for q in queries])
+    assert [[d for d, _ in r] for r in expected] == [[d for d, _ in r] for r in results]
+    print(f"前 20 名查询 {len(queries)} 次: 逐词累加 {taat * 1000:.1f} ms，"
+          f"影响值排序 {saat * 1000:.1f} ms（构建 {impact_build:.2f}s）")
+
+
+if __name__ == "__main__":
+    main()
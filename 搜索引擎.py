@@ -0,0 +1,420 @@
+import os
+import sys
+import jieba
+import math
+import warnings
+import time
+import hashlib
+import uuid
+from collections import defaultdict, Counter
+
+from 倒排索引 import PostingCursor, ImpactIndex, build_postings, impact_candidates
+from 查询 import AttributeBits, is_boolean_query, parse, evaluate, expand_terms, positive_terms
+from 模糊匹配 import NgramIndex, max_edit_distance
+from 索引存储 import save_index, load_index, read_header
+from 去重 import Deduplicator
+from 分片 import ShardedSearcher, write_shards
+from 文本读取 import read_text
+
+# 搜索引擎核心，不依赖图形界面：可视化.py 和 服务.py 共用
+
+try:
+    from docx import Document
+
+    HAS_DOCX = True
+except ImportError:
+    HAS_DOCX = False
+
+try:
+    from pptx import Presentation
+
+    HAS_PPTX = True
+except ImportError:
+    HAS_PPTX = False
+
+try:
+    import pandas as pd
+
+    HAS_PANDAS = True
+except ImportError:
+    HAS_PANDAS = False
+
+try:
+    from bs4 import BeautifulSoup
+
+    HAS_BS4 = True
+except ImportError:
+    HAS_BS4 = False
+
+
+def get_resource_path(relative_path):
+    try:
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(".")
+
+    return os.path.join(base_path, relative_path)
+
+
+# 基础配置
+warnings.filterwarnings("ignore", message=".*pkg_resources.*")
+jieba.setLogLevel(jieba.logging.ERROR)
+
+# 索引格式版本，加载低于此版本的索引时重新构建倒排表等派生结构
+INDEX_VERSION = 3
+# 模糊匹配：每个查询词最多扩展的近似词数，以及每个编辑距离的分数折扣
+FUZZY_LIMIT = 5
+FUZZY_PENALTY = 0.6
+# 影响值排序：建索引时预计算量化得分，查询时按得分从高到低处理，前 k 名确定后提前停止
+IMPACT_ORDERED = True
+# 分片评分：文档数达到 SHARD_MIN_DOCS 的库切分为 SHARD_COUNT 个分片，由多个进程并行评分
+SHARD_MIN_DOCS = 500000
+SHARD_COUNT = os.cpu_count() or 1
+
+# 搜索引擎
+class RankedSearchEngine:
+    def __init__(self, stop_words_file='stopwords.txt', impact_ordered=IMPACT_ORDERED):
+        self.documents = {}
+        self.doc_paths = {}
+        self.doc_titles = {}
+        self.doc_freq = defaultdict(int)
+        self.doc_term_freqs = {}
+        self.postings = {}
+        self.title_postings = {}
+        self.attr_bits = None
+        self.term_ngrams = None
+        self.impact_ordered = impact_ordered
+        self.impacts = None
+        self.impact_idfs = {}
+        # 每次 finalize_index 生成新的 build_id，用于给分片文件命名
+        self.build_id = ""
+        self.shards = None
+        self.shards_index_file = ""
+        self.index_version = 0
+        # 重复文件只索引一次，其余路径记在 duplicate_paths[doc_id] 中
+        self.duplicate_paths = defaultdict(list)
+        self.dedup = Deduplicator()
+        self.total_docs = 0
+        real_path = get_resource_path(stop_words_file)
+        self.stop_words = self._load_stop_words(real_path)
+        self.indexed_folder = ""
+
+    def _load_stop_words(self, file_path):
+        loaded = set()
+        if os.path.exists(file_path):
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    loaded = {line.strip() for line in f if line.strip()}
+            except:
+                pass
+        return loaded
+
+    def save_index_to_disk(self, file_path, built_at=None):
+        try:
+            state = {k: v for k, v in self.__dict__.items()
+                     if k not in ('documents', 'doc_term_freqs', 'shards', 'shards_index_file')}
+            save_index(file_path, state, self.documents, self.doc_term_freqs, self._header(built_at))
+            return True
+        except Exception as e:
+            print(f"保存索引失败: {e}")
+            return False
+
+    def load_index_from_disk(self, file_path, progress=None):
+        # 只读入词典和倒排表，文档正文和词频表按需从文件读取
+        try:
+            if not os.path.exists(file_path): return False
+            state, documents, doc_term_freqs = load_index(file_path, progress)
+            self.index_version = 0
+            self.__dict__.update(state)
+            self.documents = documents
+            self.doc_term_freqs = doc_term_freqs
+            # 旧版索引缺少倒排表等派生结构，加载后补建
+            if self.index_version < INDEX_VERSION:
+                self.finalize_index()
+                # 补建结果写回一次，之后直接按新格式快速加载；建立时间沿用原索引
+                built_at = (read_header(file_path) or {}).get('built_at') or \
+                           time.strftime('%Y-%m-%d %H:%M', time.localtime(os.path.getmtime(file_path)))
+                if self.save_index_to_disk(file_path, built_at):
+                    # 文件已被替换，正文和词频表改为从新文件按需读取
+                    _, self.documents, self.doc_term_freqs = load_index(file_path)
+            return True
+        except:
+            return False
+
+    def _header(self, built_at=None):
+        # 头文件：界面在加载前显示文档数和建立时间；build_id 用于判断分片文件是否已过期
+        return {
+            'version': self.index_version,
+            'total_docs': self.total_docs,
+            'folder': self.indexed_folder,
+            'built_at': built_at or time.strftime('%Y-%m-%d %H:%M'),
+            'build_id': self.build_id,
+        }
+
+    def add_document(self, doc_id, text, file_path, title):
+        # 返回 False 表示该文件与已有文档（近似）重复，只记录路径，不占用 doc_id
+        if self.dedup is None: self.dedup = Deduplicator()
+        original, fingerprint = self.dedup.check(text)
+        if original is not None:
+            self.duplicate_paths[original].append(file_path)
+            return False
+        self.dedup.add(doc_id, fingerprint)
+
+        self.documents[doc_id] = text
+        self.doc_paths[doc_id] = file_path
+        self.doc_titles[doc_id] = title
+        self.total_docs += 1
+
+        clean_words = self._tokenize(text)
+        # 记录词频信息
+        self.doc_term_freqs[doc_id] = {'counts': Counter(clean_words), 'length': len(clean_words)}
+        # 更新文档频率 (DF)
+        for word in set(clean_words):
+            self.doc_freq[word] += 1
+        return True
+
+    def _tokenize(self, text):
+        # 分词并过滤停用词
+        return [w for w in jieba.lcut(text) if w not in self.stop_words and len(w.strip()) > 0]
+
+    def finalize_index(self):
+        # 所有文档加入后构建压缩倒排表、标题倒排表和路径属性位图
+        self.postings = build_postings(self.doc_term_freqs)
+        title_counts = {}
+        for doc_id, title in self.doc_titles.items():
+            counts = Counter(self._tokenize(title))
+            for path in self.duplicate_paths.get(doc_id, ()):
+                counts.update(self._tokenize(os.path.basename(path)))
+            title_counts[doc_id] = {'counts': counts}
+        self.title_postings = build_postings(title_counts)
+        self.attr_bits = AttributeBits(self.doc_paths, self.indexed_folder, self.duplicate_paths)
+        self.term_ngrams = NgramIndex(self.doc_freq)
+        self.impacts = None
+        if self.impact_ordered: self._build_impacts()
+        self.build_id = uuid.uuid4().hex[:12]
+        self.index_version = INDEX_VERSION
+        # 去重签名只在建索引时使用，不写入索引文件
+        self.dedup = None
+
+    def _expand_word(self, word):
+        # 词典中没有该词时，用 n-gram 索引找编辑距离内的近似词
+        # 返回 [(词组, 权重)]：词组之间为 OR，同一词组内的词须同时出现
+        if word in self.doc_freq or self.term_ngrams is None: return [((word,), 1.0)]
+        alternatives = []
+        # 分词差异：查询词可拆成词表中的几个词（含中英混写）
+        pieces = self.term_ngrams.split(word)
+        if pieces: alternatives.append((tuple(self._frequent_variant(p) for p in pieces), 1.0))
+        matches = self.term_ngrams.search(word, max_edit_distance(word))
+        matches.sort(key=lambda m: (m[1], -self.doc_freq.get(m[0], 0)))
+        alternatives.extend(((w,), FUZZY_PENALTY ** d) for w, d in matches[:FUZZY_LIMIT])
+        # 文档中该词与相邻的字分成了一个更长的词
+        compounds = [self._frequent_variant(k) for k in self.term_ngrams.containing(word)]
+        compounds.sort(key=lambda w: -self.doc_freq.get(w, 0))
+        alternatives.extend(((w,), FUZZY_PENALTY) for w in compounds[:FUZZY_LIMIT])
+        return alternatives or [((word,), 1.0)]
+
+    def _frequent_variant(self, key):
+        # 小写形式相同的词中文档频率最高的一个
+        return max(self.term_ngrams.variants[key], key=lambda w: self.doc_freq.get(w, 0))
+
+    def enable_sharding(self, index_file, num_shards=None, processes=None):
+        # 把倒排表按文档切分为分片文件（与索引文件放在一起），之后的普通关键词搜索由进程池并行评分
+        paths = write_shards(self.postings, list(self.doc_paths), os.path.splitext(index_file)[0], self.build_id,
+                             num_shards or SHARD_COUNT)
+        self.close_shards()
+        self.shards = ShardedSearcher(paths, processes)
+        self.shards_index_file = index_file
+
+    def auto_shard(self, index_file):
+        # 大库自动启用分片评分
+        if self.total_docs >= SHARD_MIN_DOCS and SHARD_COUNT > 1:
+            self.enable_sharding(index_file)
+
+    def close_shards(self):
+        # 结束评分进程；索引已被重建（头文件中的 build_id 已变）时删除本引擎的分片文件，
+        # 仍是当前版本的分片文件保留，下次加载直接复用
+        # 进行中的分片查询不受影响，进程池在它们结束后关闭
+        shards, self.shards = self.shards, None
+        if shards is None: return
+        header = read_header(self.shards_index_file) or {}
+        shards.close(remove_files=header.get('build_id') != self.build_id)
+
+    def _build_impacts(self):
+        # 按当前 IDF 预计算每个 (词, 文档) 的得分并量化，倒排表按得分从高到低分段
+        # 只在 finalize_index 中调用，影响值与当时的 IDF 一致；查询路径不修改这两张表
+        idfs = {w: self._idf(w) for w in self.postings}
+        self.impacts = ImpactIndex(self.postings, lambda w, tc: self._tf(tc) * idfs[w])
+        self.impact_idfs = idfs
+
+    def _idf(self, word):
+        # IDF 平滑处理
+        return math.log10(self.total_docs / (self.doc_freq.get(word, 0) + 1)) + 1.0
+
+    @staticmethod
+    def _tf(term_count):
+        # TF 饱和度处理
+        return (term_count * 2.0) / (term_count + 1.5)
+
+    def search(self, query, top_k=20):
+        if is_boolean_query(query): return self._boolean_search(query, top_k)
+
+        # 预处理
+        query_words = self._tokenize(query)
+        if not query_words and len(query.strip()) > 0:
+            query_words = [query.strip()]
+        if not query_words: return []
+
+        expanded = [(w, weight) for q in query_words for terms, weight in self._expand_word(q) for w in terms]
+        # 只读一次：其他线程可能同时调用 close_shards
+        shards = self.shards
+        if shards is not None:
+            # 全局 IDF 在主进程计算，重复出现的词权重累加
+            term_weights = defaultdict(float)
+            for word, weight in expanded:
+                if word in self.postings: term_weights[word] += self._idf(word) * weight
+            results = shards.search(list(term_weights.items()), top_k)
+            # 分片评分已关闭时改为单进程评分
+            if results is not None: return self._format_results(results, top_k)
+        # 影响值在 finalize_index 中建立；未建立（未启用或尚未 finalize）时逐词累加
+        if self.impacts is not None and all(weight == 1.0 for _, weight in expanded):
+            return self._impact_search([w for w, _ in expanded], top_k)
+
+        # 评分：只遍历查询词的倒排表
+        scores = defaultdict(float)
+        for word, weight in expanded:
+            plist = self.postings.get(word)
+            if plist is None: continue
+            idf = self._idf(word) * weight
+            for doc_id, term_count in plist:
+                scores[doc_id] += self._tf(term_count) * idf
+        temp_results = [(doc_id, s) for doc_id, s in scores.items() if s > 0]
+        return self._format_results(temp_results, top_k)
+
+    def _impact_search(self, query_words, top_k):
+        # 先按影响值找出可能进入前 k 名的文档，再用倒排表精确计算这些文档的得分，结果与逐词累加一致
+        multiplicity = Counter(w for w in query_words if w in self.postings)
+        if not multiplicity: return []
+        idfs = {w: self._idf(w) for w in multiplicity}
+        # 每个词的量化误差不超过 1，另加 finalize_index 之后又加入文档造成的 IDF 变化误差
+        error = sum(m * (1 + 2 * abs(idfs[w] - self.impact_idfs.get(w, idfs[w])) * self.impacts.scale)
+                    for w, m in multiplicity.items())
+        candidates = impact_candidates(self.impacts, multiplicity, top_k, error)
+        cursors = {w: PostingCursor(self.postings[w]) for w in multiplicity}
+        temp_results = []
+        for doc_id in candidates:
+            s = 0.0
+            for word in query_words:
+                cursor = cursors.get(word)
+                if cursor is not None and cursor.advance(doc_id) == doc_id:
+                    s += self._tf(cursor.tf) * idfs[word]
+            temp_results.append((doc_id, s))
+        return self._format_results(temp_results, top_k)
+
+    def _boolean_search(self, query, top_k):
+        # 先由倒排表求交/并和属性位图得到候选集，只对候选文档评分
+        tree = parse(query, self._tokenize)
+        if tree is None or self.attr_bits is None: return []
+        weights = {}
+
+        def expand(word):
+            matches = self._expand_word(word)
+            for terms, weight in matches:
+                for w in terms: weights[w] = max(weights.get(w, 0.0), weight)
+            return [terms for terms, _ in matches]
+
+        tree = expand_terms(tree, expand)
+        doc_ids = evaluate(tree, self.postings, self.title_postings, self.attr_bits)
+        query_words = [w for w in positive_terms(tree) if w in self.postings]
+        idfs = {w: self._idf(w) * weights.get(w, 1.0) for w in set(query_words)}
+        # 候选集有序，按 doc_id 推进各词的倒排表游标读取词频
+        cursors = {w: PostingCursor(self.postings[w]) for w in idfs}
+        temp_results = []
+        for doc_id in doc_ids:
+            s = 0.0
+            for word in query_words:
+                cursor = cursors[word]
+                if cursor.advance(doc_id) == doc_id:
+                    s += self._tf(cursor.tf) * idfs[word]
+            temp_results.append((doc_id, s))
+        return self._format_results(temp_results, top_k)
+
+    def _format_results(self, temp_results, top_k):
+        max_raw_score = max((s for _, s in temp_results), default=0)
+
+        # 显式降序排序，同分按 doc_id 升序
+        temp_results.sort(key=lambda x: (-x[1], x[0]))
+
+        results = []
+        for doc_id, s in temp_results[:top_k]:
+            display_score = int((s / max_raw_score) * 99) if max_raw_score > 0 else 0
+            results.append({
+                'score': display_score,
+                'title': self.doc_titles[doc_id],
+                'path': self.doc_paths[doc_id],
+                'duplicates': list(self.duplicate_paths.get(doc_id, [])),
+                'content': self.documents[doc_id]
+            })
+        return results
+
+    def _extract_content(self, file_path):
+        ext = os.path.splitext(file_path)[1].lower()
+        content = ""
+        try:
+            if ext == '.pdf':
+                # 只在解析 PDF 时导入，搜索服务启动时不加载
+                import pdfplumber
+                with pdfplumber.open(file_path) as pdf:
+                    for page in pdf.pages:
+                        txt = page.extract_text()
+                        if txt: content += txt + "\n"
+            elif ext == '.docx' and HAS_DOCX:
+                doc = Document(file_path)
+                content = "\n".join([p.text for p in doc.paragraphs])
+            elif ext == '.pptx' and HAS_PPTX:
+                prs = Presentation(file_path)
+                for slide in prs.slides:
+                    for shape in slide.shapes:
+                        if hasattr(shape, "text"): content += shape.text + "\n"
+            elif ext in ['.xlsx', '.xls', '.csv'] and HAS_PANDAS:
+                if ext == '.csv':
+                    df = pd.read_csv(file_path, on_bad_lines='skip')
+                else:
+                    df = pd.read_excel(file_path)
+                content = df.to_string()
+            elif ext in ['.html', '.xml'] and HAS_BS4:
+                # 编码无法识别的网页仍按 utf-8 尽量解码，不整篇丢弃
+                text = read_text(file_path, lossy=True)
+                if text: content = BeautifulSoup(text, 'html.parser').get_text()
+            elif ext in ['.txt', '.md', '.py', '.json', '.log', '.xml']:
+                content = read_text(file_path)
+        except Exception as e:
+            print(f"❌ 解析失败: {os.path.basename(file_path)} -> {e}")
+        return content
+
+def get_index_path(folder_path, indexes_dir="indexes"):
+    hash_name = hashlib.md5(folder_path.encode('utf-8')).hexdigest()
+    return os.path.join(indexes_dir, f"index_{hash_name}.pkl")
+
+
+def build_index_from_folder(folder_path, engine):
+    # 扫描文件夹并建立索引，返回 (有效文档数, 合并的重复文件数)
+    count = 0
+    duplicates = 0
+    print(f"--- 开始扫描文件夹: {folder_path} ---")
+    engine.indexed_folder = folder_path
+    for root, dirs, files in os.walk(folder_path):
+        for file in files:
+            full_path = os.path.join(root, file)
+            print(f"正在读取: {file}")
+            content = engine._extract_content(full_path)
+
+            if content.strip():
+                # 重复文件不占用新的 doc_id
+                if engine.add_document(count, content, full_path, file):
+                    count += 1
+                else:
+                    duplicates += 1
+
+    print(f"--- 扫描结束，共有效索引 {count} 个文件，合并重复文件 {duplicates} 个 ---")
+    engine.finalize_index()
+    return count, duplicates
@@ -0,0 +1,97 @@
+import os
+import mmap
+import codecs
+
+# 文本文件读取：先根据 BOM 或文件开头的样本判断编码，再从 mmap 一次性解码整个文件，
+# 不再按 utf-8、gbk、gb18030 ... 依次尝试把大文件整体解码多遍。
+# 开头是常见二进制格式标志或含有 NUL 字节的文件直接跳过，不做解码。
+
+SAMPLE_SIZE = 64 * 1024
+
+_BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# 压缩包、图片、音视频、Office 二进制等格式的文件头
+BINARY_MAGIC = (
+    b'PK\x03\x04', b'\x1f\x8b', b'7z\xbc\xaf\x27\x1c', b'Rar!\x1a\x07', b'\xfd7zXZ\x00',
+    b'%PDF-', b'\x89PNG', b'\xff\xd8\xff', b'GIF87a', b'GIF89a', b'RIFF', b'OggS', b'fLaC', b'ID3',
+    b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', b'SQLite format 3\x00', b'\x7fELF', b'\xca\xfe\xba\xbe',
+)
+
+# 没有 BOM 时依次尝试的编码；gb18030 兼容 gbk
+_FALLBACK = ('utf-8', 'gb18030')
+
+
+def detect_encoding(sample):
+    # 返回编码名；判断为二进制文件时返回 None，是文本但 utf-8 和 gb18030 都无法解码时返回空字符串
+    for bom, enc in _BOMS:
+        if sample.startswith(bom): return enc
+    if sample.startswith(BINARY_MAGIC): return None
+    if b'\x00' in sample:
+        # 无 BOM 的 UTF-16：英文字符的高位字节为 0，NUL 集中在奇数或偶数位置
+        odd = sample[1::2].count(0)
+        even = sample[0::2].count(0)
+        half = len(sample) // 2
+        if odd > half * 0.3 and even < half * 0.05: return 'utf-16-le'
+        if even > half * 0.3 and odd < half * 0.05: return 'utf-16-be'
+        return None
+    for enc in _FALLBACK:
+        try:
+            # 样本末尾可能截断多字节字符，使用增量解码器且不结束
+            codecs.getincrementaldecoder(enc)().decode(sample, final=False)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return ''
+
+
+def _is_utf8_tail(sample):
+    # 尾部样本可能从多字节字符中间开始，跳过开头的续字节
+    start = 0
+    while start < min(3, len(sample)) and 0x80 <= sample[start] < 0xC0:
+        start += 1
+    try:
+        sample[start:].decode('utf-8')
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def read_text(file_path, lossy=False):
+    # 读取文本文件，二进制文件返回空字符串；无法解码的文本文件默认也返回空字符串，
+    # lossy 为 True 时（HTML 等标记文件）按 utf-8 解码并丢弃无法解码的字节
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0: return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            enc = detect_encoding(mm[:SAMPLE_SIZE])
+            if enc is None: return ""
+            if enc == 'utf-8' and len(mm) > SAMPLE_SIZE and not _is_utf8_tail(mm[-SAMPLE_SIZE:]):
+                # 开头是英文、后面才出现中文的 GBK 文件，避免整体按 utf-8 解码失败后再解码一遍
+                enc = 'gb18030'
+            # 样本之后的内容仍可能不符合判断出的编码（例如开头全是英文的 GBK 文件），此时改用其他编码
+            if not enc:
+                candidates = []
+            elif enc in _FALLBACK:
+                candidates = [enc] + [e for e in _FALLBACK if e != enc]
+            else:
+                candidates = [enc]
+            with memoryview(mm) as view:
+                for enc in candidates:
+                    try:
+                        text = str(view, enc)
+                        break
+                    except UnicodeDecodeError:
+                        continue
+                else:
+                    if not lossy: return ""
+                    text = str(view, 'utf-8', 'ignore')
+    # 与文本模式打开文件一致，统一换行符
+    if '\r' in text:
+        text = text.replace('\r\n', '\n')
+        if '\r' in text: text = text.replace('\r', '\n')
+    return text
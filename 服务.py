@@ -0,0 +1,288 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+from 搜索引擎 import RankedSearchEngine, build_index_from_folder, get_index_path
+from 索引存储 import IndexChangedError, read_header
+
+# 本地 HTTP/JSON 搜索服务：同一台机器上的多个工具共用一份已加载的索引
+#   GET  /search?q=关键词&folder=库路径&top_k=20
+#   GET  /stats
+#   POST /reindex?folder=库路径      （也可用 JSON 请求体 {"folder": ...}）
+# 不指定 folder 时使用已加载的唯一一个库，或 history_folders.json 中的第一个库。
+
+MAX_BODY = 1 << 20
+PREVIEW_CHARS = 150
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class SearchService:
+    def __init__(self, indexes_dir="indexes", workers=4, shards=0):
+        self.indexes_dir = indexes_dir
+        # 分片数；0 表示按库大小自动决定（见 RankedSearchEngine.auto_shard）
+        self.shards = shards
+        self.libraries = {}
+        self.loading = {}
+        self.reindexing = set()
+        self.tasks = set()
+        # 搜索评分在线程池中执行，事件循环只负责收发请求；重建索引单独一个线程，不占用搜索线程
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.index_executor = ThreadPoolExecutor(max_workers=1)
+        self.started_at = time.time()
+        self.requests = 0
+        self.in_flight = 0
+
+    def default_folder(self):
+        if len(self.libraries) == 1: return next(iter(self.libraries))
+        try:
+            with open("history_folders.json", "r", encoding='utf-8') as f:
+                history = json.load(f)
+            if history: return history[0]
+        except:
+            pass
+        raise HttpError(400, "缺少参数 folder")
+
+    async def get_engine(self, folder):
+        # 同一个库只加载一次，并发请求等待同一个加载任务
+        if folder in self.libraries: return self.libraries[folder]
+        if folder not in self.loading:
+            self.loading[folder] = asyncio.ensure_future(self._load(folder))
+        try:
+            return await asyncio.shield(self.loading[folder])
+        finally:
+            if self.loading.get(folder) is not None and self.loading[folder].done():
+                self.loading.pop(folder, None)
+
+    async def _load(self, folder):
+        index_file = get_index_path(folder, self.indexes_dir)
+        if not os.path.exists(index_file): raise HttpError(404, f"此库无索引: {folder}")
+        engine = RankedSearchEngine()
+        loop = asyncio.get_running_loop()
+        success = await loop.run_in_executor(self.executor, engine.load_index_from_disk, index_file)
+        if not success: raise HttpError(500, f"索引损坏，请重建: {folder}")
+        await loop.run_in_executor(self.executor, self._shard, engine, index_file)
+        self.libraries[folder] = engine
+        print(f"已加载索引: {folder} ({engine.total_docs} 篇文档)")
+        return engine
+
+    async def search(self, params):
+        query = params.get('q', '').strip()
+        if not query: raise HttpError(400, "缺少参数 q")
+        folder = params.get('folder') or self.default_folder()
+        try:
+            top_k = max(1, min(int(params.get('top_k', 20)), 200))
+        except ValueError:
+            raise HttpError(400, "top_k 必须是整数")
+        engine = await self.get_engine(folder)
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self.executor, self._run_search, engine, query, top_k)
+        except IndexChangedError:
+            # 索引文件已被其他程序替换：丢弃旧引擎，重新加载后再搜索一次；
+            # close_shards 不会中断其他请求在旧引擎上进行中的分片查询
+            if self.libraries.get(folder) is engine:
+                del self.libraries[folder]
+                engine.close_shards()
+            engine = await self.get_engine(folder)
+            results = await loop.run_in_executor(self.executor, self._run_search, engine, query, top_k)
+        return {
+            'query': query,
+            'folder': folder,
+            'took_ms': round((time.perf_counter() - start) * 1000, 2),
+            'results': results,
+        }
+
+    @staticmethod
+    def _run_search(engine, query, top_k):
+        # 在工作线程中执行：评分，以及从索引文件读取正文生成摘要
+        results = []
+        for res in engine.search(query, top_k):
+            content = res.pop('content').replace('\n', ' ')
+            idx = max(content.find(query), 0)
+            start = max(0, idx - 30)
+            res['preview'] = content[start:start + PREVIEW_CHARS]
+            results.append(res)
+        return results
+
+    def stats(self):
+        libraries = []
+        for folder, engine in self.libraries.items():
+            header = read_header(get_index_path(folder, self.indexes_dir)) or {}
+            libraries.append({
+                'folder': folder,
+                'total_docs': engine.total_docs,
+                'terms': len(engine.doc_freq),
+                'duplicate_files': sum(len(p) for p in engine.duplicate_paths.values()),
+                'built_at': header.get('built_at'),
+                'reindexing': folder in self.reindexing,
+            })
+        return {
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'requests': self.requests,
+            'in_flight': self.in_flight,
+            'libraries': libraries,
+            'loading': list(self.loading),
+            'reindexing': sorted(self.reindexing),
+        }
+
+    async def reindex(self, params):
+        folder = params.get('folder') or self.default_folder()
+        if not os.path.isdir(folder): raise HttpError(404, f"文件夹不存在: {folder}")
+        if folder in self.reindexing: raise HttpError(409, f"正在重建: {folder}")
+        self.reindexing.add(folder)
+        task = asyncio.ensure_future(self._reindex(folder))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return {'folder': folder, 'status': 'started'}
+
+    async def _reindex(self, folder):
+        # 新索引建好并保存后再替换，重建期间的搜索继续使用旧索引
+        loop = asyncio.get_running_loop()
+        try:
+            engine = await loop.run_in_executor(self.index_executor, self._build, folder)
+            old = self.libraries.get(folder)
+            self.libraries[folder] = engine
+            if old is not None: old.close_shards()
+            print(f"重建完成: {folder} ({engine.total_docs} 篇文档)")
+        except Exception as e:
+            print(f"× 重建索引错误: {folder} -> {e}")
+        finally:
+            self.reindexing.discard(folder)
+
+    def _build(self, folder):
+        engine = RankedSearchEngine()
+        build_index_from_folder(folder, engine)
+        os.makedirs(self.indexes_dir, exist_ok=True)
+        index_file = get_index_path(folder, self.indexes_dir)
+        engine.save_index_to_disk(index_file)
+        self._shard(engine, index_file)
+        return engine
+
+    def _shard(self, engine, index_file):
+        if self.shards > 1:
+            engine.enable_sharding(index_file, self.shards)
+        elif self.shards == 0:
+            engine.auto_shard(index_file)
+
+    def close(self):
+        for engine in self.libraries.values():
+            engine.close_shards()
+
+    async def dispatch(self, method, target, body):
+        # 返回 (状态码, 响应数据)
+        url = urlsplit(target)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if body:
+            try:
+                data = json.loads(body.decode('utf-8'))
+            except (ValueError, UnicodeDecodeError):
+                raise HttpError(400, "请求体不是合法的 JSON")
+            if not isinstance(data, dict): raise HttpError(400, "请求体必须是 JSON 对象")
+            for key, value in data.items():
+                # 整数参数（如 top_k）按字符串处理，与查询字符串中的参数一致
+                if isinstance(value, int) and not isinstance(value, bool): value = str(value)
+                if not isinstance(value, str): raise HttpError(400, f"参数 {key} 必须是字符串")
+                params[key] = value
+        if url.path == '/search' and method == 'GET': return 200, await self.search(params)
+        if url.path == '/stats' and method == 'GET': return 200, self.stats()
+        if url.path == '/reindex' and method == 'POST': return 202, await self.reindex(params)
+        if url.path in ('/search', '/stats', '/reindex'): raise HttpError(405, "不支持的请求方法")
+        raise HttpError(404, "未知的接口")
+
+    async def handle_connection(self, reader, writer):
+        # HTTP/1.1，支持 keep-alive，同一连接上的请求依次处理
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line: break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, {'error': "请求格式错误"}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''): break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                except ValueError:
+                    length = -1
+                if not 0 <= length <= MAX_BODY:
+                    await self._respond(writer, 413, {'error': "请求体长度无效或过大"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+
+                self.requests += 1
+                self.in_flight += 1
+                try:
+                    status, payload = await self.dispatch(method, target, body)
+                except HttpError as e:
+                    status, payload = e.status, {'error': e.message}
+                except Exception as e:
+                    status, payload = 500, {'error': str(e)}
+                finally:
+                    self.in_flight -= 1
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive: break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        reasons = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                   409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {reasons.get(status, 'OK')}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+
+async def serve(host, port, workers, preload, shards):
+    service = SearchService(workers=workers, shards=shards)
+    for folder in preload:
+        try:
+            await service.get_engine(folder)
+        except HttpError as e:
+            print(f"⚠️ {e.message}")
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"搜索服务已启动: http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地搜索服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=min(8, (os.cpu_count() or 1) + 2))
+    parser.add_argument('--preload', nargs='*', default=[], help="启动时预先加载的库文件夹")
+    parser.add_argument('--shards', type=int, default=0,
+                        help="分片评分的分片数；0 为按库大小自动决定，1 为不分片")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.preload, args.shards))
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -0,0 +1,255 @@
+import os
+import re
+from collections import defaultdict
+
+from 倒排索引 import intersect, union, difference
+
+# 布尔查询语法：
+#   机器学习 算法              相邻的词之间为 OR（与普通搜索一致）
+#   机器学习 AND 算法          AND / OR / NOT，优先级 NOT > AND > OR
+#   (python OR java) NOT 教程  括号分组
+#   "深度 学习"                引号内的分词结果全部出现
+#   ext:pdf  path:D:/资料  title:报告
+#                              过滤条件和 NOT 与同组的词做 AND
+
+FILTER_FIELDS = ('ext', 'path', 'title')
+
+_TOKEN_RE = re.compile(r'\s*(?:([()])|(\w+):("[^"]*"|[^\s()]+)|("[^"]*")|([^\s()]+))')
+_BOOLEAN_RE = re.compile(r'[()（）"]|(?<!\S)(?:AND|OR|NOT)(?!\S)|(?<!\S)(?i:ext|path|title):')
+_OPERATORS = ('AND', 'OR', 'NOT')
+
+
+def is_boolean_query(query):
+    return bool(_BOOLEAN_RE.search(query))
+
+
+def normalize_path(path):
+    return path.replace('\\', '/').rstrip('/').lower()
+
+
+def _lex(query):
+    query = query.replace('（', '(').replace('）', ')')
+    tokens = []
+    for paren, field, value, quoted, word in _TOKEN_RE.findall(query):
+        if paren:
+            tokens.append(('paren', paren))
+        elif field:
+            if field.lower() in FILTER_FIELDS:
+                tokens.append(('field', field.lower(), value.strip('"')))
+            else:
+                tokens.append(('word', f"{field}:{value}"))
+        elif quoted:
+            tokens.append(('phrase', quoted.strip('"')))
+        elif word in _OPERATORS:
+            tokens.append(('op', word))
+        elif word:
+            tokens.append(('word', word))
+    return tokens
+
+
+class _Parser:
+    # 递归下降解析，语法错误（多余或缺失的括号、悬空的运算符）一律宽松忽略
+    def __init__(self, tokens, tokenize):
+        self.tokens = tokens
+        self.pos = 0
+        self.tokenize = tokenize
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def parse(self):
+        nodes = []
+        while self.peek() is not None:
+            node = self.parse_or()
+            if node is not None: nodes.append(node)
+            if self.peek() == ('paren', ')'): self.pos += 1
+        return _combine('or', nodes)
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek() == ('op', 'OR'):
+            self.pos += 1
+            nodes.append(self.parse_and())
+        return _combine('or', [n for n in nodes if n is not None])
+
+    def parse_and(self):
+        nodes = [self.parse_seq()]
+        while self.peek() == ('op', 'AND'):
+            self.pos += 1
+            nodes.append(self.parse_seq())
+        return _combine('and', [n for n in nodes if n is not None])
+
+    def parse_seq(self):
+        # 相邻的词取并集，过滤条件和 NOT 对整组取交集
+        terms, filters = [], []
+        while True:
+            token = self.peek()
+            if token is None or token == ('paren', ')') or token in (('op', 'AND'), ('op', 'OR')): break
+            node = self.parse_unary()
+            if node is None: continue
+            (filters if node[0] == 'not' or _is_filter(node) else terms).append(node)
+        group = _combine('or', terms)
+        return _combine('and', filters + [group] if group is not None else filters)
+
+    def parse_unary(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        kind = token[0]
+        if kind == 'op':
+            if token[1] != 'NOT' or self.peek() is None: return None
+            child = self.parse_unary()
+            return ('not', child) if child is not None else None
+        if kind == 'paren':
+            node = self.parse_or()
+            if self.peek() == ('paren', ')'): self.pos += 1
+            return node
+        if kind == 'field':
+            field, value = token[1], token[2]
+            if field == 'title': return _combine('and', [('title', w) for w in self.tokenize(value) or [value]])
+            return (field, value)
+        words = self.tokenize(token[1]) or [token[1].strip()]
+        return _combine('and' if kind == 'phrase' else 'or', [('term', w) for w in words if w])
+
+
+def _is_filter(node):
+    if node[0] in FILTER_FIELDS: return True
+    if node[0] == 'not': return _is_filter(node[1])
+    if node[0] in ('and', 'or'): return all(_is_filter(n) for n in node[1])
+    return False
+
+
+def _combine(op, nodes):
+    if not nodes: return None
+    if len(nodes) == 1: return nodes[0]
+    return (op, nodes)
+
+
+def parse(query, tokenize):
+    # tokenize 为分词函数（去停用词），返回语法树；空查询返回 None
+    return _Parser(_lex(query), tokenize).parse()
+
+
+def expand_terms(node, expand):
+    # 把每个检索词替换为 expand(词) 返回的若干词组的 OR，词组内的词为 AND
+    if node is None: return None
+    if node[0] == 'term':
+        return _combine('or', [_combine('and', [('term', w) for w in terms]) for terms in expand(node[1])])
+    if node[0] == 'not': return ('not', expand_terms(node[1], expand))
+    if node[0] in ('and', 'or'): return (node[0], [expand_terms(n, expand) for n in node[1]])
+    return node
+
+
+def positive_terms(node):
+    # 不在 NOT 之下的检索词，用于相关性评分
+    if node is None or node[0] == 'not': return []
+    if node[0] == 'term': return [node[1]]
+    if node[0] in ('and', 'or'): return [w for n in node[1] for w in positive_terms(n)]
+    return []
+
+
+def bits_to_docs(bits):
+    # 位图 -> 有序 doc_id 列表，逐个查找 '1' 而不逐位移位
+    s = bin(bits)[:1:-1]
+    docs = []
+    i = s.find('1')
+    while i != -1:
+        docs.append(i)
+        i = s.find('1', i + 1)
+    return docs
+
+
+def _bits_from_docs(doc_ids):
+    table = bytearray(max(doc_ids) // 8 + 1)
+    for d in doc_ids:
+        table[d >> 3] |= 1 << (d & 7)
+    return int.from_bytes(table, 'little')
+
+
+class AttributeBits:
+    # 文档属性位图：第 i 位为 1 表示 doc_id 为 i 的文档具有该属性
+    # ext_bits 以扩展名为键，dir_bits 以（规范化后的）每一级上级目录为键
+    # duplicate_paths 为 {doc_id: [重复文件路径]}，重复文件的扩展名和目录也算作该文档的属性
+    def __init__(self, doc_paths, folder="", duplicate_paths=None):
+        self.folder = normalize_path(folder)
+        self.size = max(doc_paths) + 1 if doc_paths else 0
+        all_paths = list(doc_paths.items())
+        for doc_id, paths in (duplicate_paths or {}).items():
+            all_paths.extend((doc_id, p) for p in paths)
+        exts, dirs = defaultdict(set), defaultdict(set)
+        for doc_id, path in all_paths:
+            exts[os.path.splitext(path)[1].lower()].add(doc_id)
+            parent = normalize_path(path).rsplit('/', 1)[0]
+            while parent:
+                dirs[parent].add(doc_id)
+                if '/' not in parent: break
+                parent = parent.rsplit('/', 1)[0]
+        self.ext_bits = {k: _bits_from_docs(v) for k, v in exts.items()}
+        self.dir_bits = {k: _bits_from_docs(v) for k, v in dirs.items()}
+        self.all_bits = _bits_from_docs(list(doc_paths)) if doc_paths else 0
+
+    def ext(self, value):
+        bits = 0
+        for e in value.lower().split(','):
+            if e: bits |= self.ext_bits.get(e if e.startswith('.') else '.' + e, 0)
+        return bits
+
+    def path(self, value):
+        # 按目录边界匹配：path:D:/资料/论文 匹配该目录及其子目录，不匹配 D:/资料/论文集；相对路径按当前库目录解析
+        # dir_bits 含每一级上级目录，子目录中的文档已计入上级目录的位图，直接查表即可
+        for prefix in (normalize_path(value), f"{self.folder}/{normalize_path(value)}"):
+            if prefix in self.dir_bits: return self.dir_bits[prefix]
+        return 0
+
+    def filter(self, docs, bits):
+        table = bits.to_bytes((self.size + 7) // 8, 'little')
+        return [d for d in docs if table[d >> 3] >> (d & 7) & 1]
+
+
+def evaluate(node, postings, title_postings, attrs):
+    # 返回值为有序 doc_id 列表
+    result = _eval(node, postings, title_postings, attrs)
+    if isinstance(result, int): return bits_to_docs(result)
+    if not isinstance(result, list): return result.doc_ids()
+    return result
+
+
+def _eval(node, postings, title_postings, attrs):
+    # 中间结果为位图(int)、PostingList 或有序 doc_id 列表
+    kind = node[0]
+    if kind == 'term': return postings.get(node[1], [])
+    if kind == 'title': return title_postings.get(node[1], [])
+    if kind == 'ext': return attrs.ext(node[1])
+    if kind == 'path': return attrs.path(node[1])
+    if kind == 'or': return _eval_or(node[1], postings, title_postings, attrs)
+    if kind == 'and': return _eval_and(node[1], postings, title_postings, attrs)
+    return _eval_and([node], postings, title_postings, attrs)
+
+
+def _eval_and(children, postings, title_postings, attrs):
+    lists, excluded = [], []
+    mask = attrs.all_bits
+    for child in children:
+        negate = child[0] == 'not'
+        value = _eval(child[1] if negate else child, postings, title_postings, attrs)
+        if isinstance(value, int):
+            mask &= ~value if negate else value
+        else:
+            (excluded if negate else lists).append(value)
+    if lists:
+        docs = intersect(lists)
+        if mask != attrs.all_bits: docs = attrs.filter(docs, mask)
+    else:
+        if not excluded: return mask
+        docs = bits_to_docs(mask)
+    for value in excluded:
+        docs = difference(docs, value)
+    return docs
+
+
+def _eval_or(children, postings, title_postings, attrs):
+    values = [_eval(child, postings, title_postings, attrs) for child in children]
+    if all(isinstance(v, int) for v in values):
+        bits = 0
+        for v in values: bits |= v
+        return bits
+    return union([bits_to_docs(v) if isinstance(v, int) else v for v in values])
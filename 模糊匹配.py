@@ -0,0 +1,103 @@
+from array import array
+from collections import Counter
+
+# 词首 / 词尾填充字符，使首尾字符也能组成 n-gram
+_PAD_START = '\x02'
+_PAD_END = '\x03'
+
+
+def max_edit_distance(word):
+    # 按词长决定允许的编辑距离；两个字以内（多数中文词）只做大小写归一
+    if len(word) <= 2: return 0
+    if len(word) <= 7: return 1
+    return 2
+
+
+def bounded_edit_distance(a, b, k):
+    # 编辑距离（相邻字符交换记 1 次），超过 k 时提前结束并返回 k + 1
+    if abs(len(a) - len(b)) > k: return k + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        row_min = i
+        for j, cb in enumerate(b, 1):
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+            if prev2 is not None and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                d = min(d, prev2[j - 2] + 1)
+            cur.append(d)
+            if d < row_min: row_min = d
+        if row_min > k: return k + 1
+        prev2, prev = prev, cur
+    return prev[-1] if prev[-1] <= k else k + 1
+
+
+class NgramIndex:
+    # 词表上的字符 n-gram 倒排：gram -> 包含该 gram 的词编号
+    # 查询时先按共有 gram 数过滤候选，再对少量候选计算编辑距离，不扫描整个词表
+    def __init__(self, terms, n=2):
+        self.n = n
+        self.keys = []
+        self.variants = {}
+        grams = {}
+        for term in terms:
+            key = term.lower()
+            if key in self.variants:
+                self.variants[key].append(term)
+                continue
+            self.variants[key] = [term]
+            term_id = len(self.keys)
+            self.keys.append(key)
+            for g in set(self._grams(key)):
+                if g not in grams: grams[g] = array('I')
+                grams[g].append(term_id)
+        self.grams = grams
+
+    def _grams(self, key):
+        padded = _PAD_START + key + _PAD_END
+        return [padded[i:i + self.n] for i in range(len(padded) - self.n + 1)]
+
+    def search(self, word, max_dist):
+        # 返回 [(词, 编辑距离)]，按小写比较
+        key = word.lower()
+        if max_dist == 0: return [(t, 0) for t in self.variants.get(key, [])]
+        query_grams = set(self._grams(key))
+        counts = Counter()
+        for g in query_grams:
+            counts.update(self.grams.get(g, ()))
+        # 每次编辑（含相邻交换）最多破坏 n + 1 个 gram，共有 gram 数不足的词不可能在距离内
+        need = max(1, len(query_grams) - max_dist * (self.n + 1))
+        results = []
+        for term_id, c in counts.items():
+            if c < need: continue
+            candidate = self.keys[term_id]
+            if abs(len(candidate) - len(key)) > max_dist: continue
+            d = bounded_edit_distance(key, candidate, max_dist)
+            if d <= max_dist: results.extend((t, d) for t in self.variants[candidate])
+        return results
+
+    def split(self, word, max_pieces=3):
+        # 把词表中没有的词切分为词表中的几个词（段数最少），用于查询与文档分词不一致的情况，
+        # 例如文档中分为 机器 / 学习 而查询为 机器学习；返回各段的小写形式，无法切分时返回 []
+        key = word.lower()
+        best = [None] * (len(key) + 1)
+        best[0] = []
+        for i in range(len(key)):
+            if best[i] is None or len(best[i]) >= max_pieces: continue
+            for j in range(i + 1, len(key) + 1):
+                piece = key[i:j]
+                if piece in self.variants and (best[j] is None or len(best[i]) + 1 < len(best[j])):
+                    best[j] = best[i] + [piece]
+        pieces = best[-1]
+        # 全部切成单字的结果没有意义
+        if not pieces or len(pieces) < 2 or all(len(p) == 1 for p in pieces): return []
+        return pieces
+
+    def containing(self, word):
+        # 包含该词的更长的词（文档中该词与相邻的字分成了一个词），返回小写形式
+        key = word.lower()
+        if len(key) < self.n: return []
+        lists = [self.grams.get(key[i:i + self.n]) for i in range(len(key) - self.n + 1)]
+        if not all(lists): return []
+        # 只需核对最短的 gram 列表中的词
+        return [self.keys[t] for t in min(lists, key=len) if key in self.keys[t] and self.keys[t] != key]
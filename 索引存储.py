@@ -0,0 +1,165 @@
+import os
+import json
+import pickle
+import struct
+import threading
+from collections.abc import Mapping
+
+# 索引文件格式：
+#   MAGIC | 核心部分长度(8 字节) | 核心部分 pickle | 全部文档正文(utf-8 拼接) | doc_term_freqs pickle
+# 核心部分包含词典、倒排表、路径和标题等查询必需的数据，加载后即可搜索；
+# 文档正文和词频表只在用到时按偏移读取。另有同名 .json 头文件记录文档数、建立时间和文件夹。
+MAGIC = b'MYSEARCH-INDEX\n'
+_LENGTH = struct.Struct('<Q')
+
+
+class IndexChangedError(Exception):
+    # 加载后索引文件被替换（重建索引、其他程序写入），按旧偏移读取会得到错误的内容
+    pass
+
+
+def file_stamp(f):
+    # 同一个文件被 os.replace 替换后 inode、大小或修改时间至少有一项不同
+    st = os.fstat(f.fileno())
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def _open_checked(index_file, stamp):
+    f = open(index_file, 'rb')
+    if file_stamp(f) != stamp:
+        f.close()
+        raise IndexChangedError(f"索引文件已被替换，请重新加载: {index_file}")
+    return f
+
+
+def header_path(index_file):
+    return os.path.splitext(index_file)[0] + '.json'
+
+
+def read_header(index_file):
+    try:
+        with open(header_path(index_file), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except:
+        return None
+
+
+def save_index(index_file, state, documents, doc_term_freqs, header):
+    encoded = [(doc_id, text.encode('utf-8')) for doc_id, text in documents.items()]
+    offsets = {}
+    pos = 0
+    for doc_id, data in encoded:
+        offsets[doc_id] = (pos, len(data))
+        pos += len(data)
+    core = pickle.dumps(dict(state, document_offsets=offsets, documents_size=pos),
+                        protocol=pickle.HIGHEST_PROTOCOL)
+
+    # 先写临时文件再替换，避免写到一半的索引覆盖旧索引
+    tmp_file = index_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(MAGIC)
+        f.write(_LENGTH.pack(len(core)))
+        f.write(core)
+        for _, data in encoded:
+            f.write(data)
+        pickle.dump(dict(doc_term_freqs), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, index_file)
+    write_header(index_file, header)
+
+
+def write_header(index_file, header):
+    with open(header_path(index_file), 'w', encoding='utf-8') as f:
+        json.dump(header, f, ensure_ascii=False)
+
+
+def load_index(index_file, progress=None):
+    # 返回 (核心状态, 文档正文, 词频表)；progress(0~1) 报告核心部分的读取进度
+    with open(index_file, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            # 旧版索引：整个 __dict__ 一次性 pickle
+            f.seek(0)
+            state = pickle.load(_ProgressReader(f, os.path.getsize(index_file), progress))
+            return state, state.pop('documents', {}), state.pop('doc_term_freqs', {})
+        stamp = file_stamp(f)
+        core_size = _LENGTH.unpack(f.read(_LENGTH.size))[0]
+        state = pickle.load(_ProgressReader(f, core_size, progress))
+    docs_base = len(MAGIC) + _LENGTH.size + core_size
+    documents = LazyDocuments(index_file, stamp, docs_base, state.pop('document_offsets'))
+    doc_term_freqs = LazyPickle(index_file, stamp, docs_base + state.pop('documents_size'))
+    return state, documents, doc_term_freqs
+
+
+class _ProgressReader:
+    # 包装文件对象，每读完约 1% 回调一次进度
+    def __init__(self, f, total, callback):
+        self.f = f
+        self.total = max(total, 1)
+        self.callback = callback
+        self.done = 0
+        self.reported = 0.0
+
+    def read(self, size=-1):
+        return self._advance(self.f.read(size))
+
+    def readline(self):
+        return self._advance(self.f.readline())
+
+    def _advance(self, data):
+        self.done += len(data)
+        fraction = min(self.done / self.total, 1.0)
+        if self.callback and fraction - self.reported >= 0.01:
+            self.reported = fraction
+            self.callback(fraction)
+        return data
+
+
+class LazyDocuments(Mapping):
+    # doc_id -> 正文，访问时才从索引文件按偏移读取；文件已被替换时抛出 IndexChangedError
+    def __init__(self, index_file, stamp, base, offsets):
+        self.index_file = index_file
+        self.stamp = stamp
+        self.base = base
+        self.offsets = offsets
+
+    def __getitem__(self, doc_id):
+        offset, size = self.offsets[doc_id]
+        with _open_checked(self.index_file, self.stamp) as f:
+            f.seek(self.base + offset)
+            return f.read(size).decode('utf-8')
+
+    def __iter__(self):
+        return iter(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.offsets
+
+
+class LazyPickle(Mapping):
+    # 首次访问时才从索引文件的指定位置反序列化的字典；文件已被替换时抛出 IndexChangedError
+    def __init__(self, index_file, stamp, offset):
+        self.index_file = index_file
+        self.stamp = stamp
+        self.offset = offset
+        self._data = None
+        self._lock = threading.Lock()
+
+    @property
+    def data(self):
+        with self._lock:
+            if self._data is None:
+                with _open_checked(self.index_file, self.stamp) as f:
+                    f.seek(self.offset)
+                    self._data = pickle.load(f)
+            return self._data
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
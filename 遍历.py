@@ -5,6 +5,8 @@ import warnings
 import pdfplumber
 from collections import defaultdict, Counter
 
+from 文本读取 import read_text
+
 warnings.filterwarnings("ignore", message=".*pkg_resources.*")
 jieba.setLogLevel(jieba.logging.ERROR)
 
@@ -97,14 +99,10 @@ def read_file_content(file_path):
     if file_path.lower().endswith('.pdf'):
         return extract_text_from_pdf(file_path)
 
-    encodings = ['utf-8', 'gbk', 'gb18030', 'utf-16']
-    for enc in encodings:
-        try:
-            with open(file_path, 'r', encoding=enc) as f:
-                return f.read()
-        except:
-            continue
-    return ""
+    try:
+        return read_text(file_path)
+    except OSError:
+        return ""
 
 def build_index_from_folder(folder_path, engine):
     print(f"正在扫描文件夹: {folder_path} ...")